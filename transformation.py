@@ -1,12 +1,24 @@
+import numpy as np
 import pandas as pd
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.http import DEFAULT_HTTP_TIMEOUT_SEC
 from googleapiclient.errors import HttpError
-import gspread
+import httplib2
+import functools
+import gzip
+import logging
 import os
 from typing import Tuple, Dict, List, Any
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# Let derived frames share data until they are written to (the default from pandas 3.0)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
 SHEET_NAMES = {
     'STOCK_INFLOW': 'stock_inflow',
     'RELEASE': 'release',
@@ -15,6 +27,10 @@ SHEET_NAMES = {
     'SUMMARY': 'summary'
 }
 
+COLUMN_ALIASES = {
+    'weight_in_kg': 'weight',
+    'weight_at_delivery': 'weight'
+}
 
 DATE_FORMATS = ['%d %b %Y', '%d/%m/%y', '%d-%b-%Y']
 GOOGLE_SHEETS_SCOPE = ['https://www.googleapis.com/auth/spreadsheets']
@@ -23,6 +39,48 @@ class DataProcessingError(Exception):
     """Custom exception for data processing errors"""
     pass
 
+class GzipRequestHttp(httplib2.Http):
+    """httplib2 transport that can gzip-compress large JSON request bodies.
+    
+    Compression is off unless gzip_requests is True. If the server answers a
+    compressed request with 400 or 415, the request is resent uncompressed and
+    compression stays off for this transport.
+    """
+    MIN_GZIP_SIZE = 1024
+    GZIP_REJECTED_STATUSES = {400, 415}
+
+    def __init__(self, *args, gzip_requests: bool = False, **kwargs):
+        kwargs.setdefault('timeout', DEFAULT_HTTP_TIMEOUT_SEC)
+        super().__init__(*args, **kwargs)
+        # Match googleapiclient's build_http: 308 is not a redirect for Google APIs
+        self.redirect_codes = self.redirect_codes - {308}
+        self.gzip_requests = gzip_requests
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        headers = dict(headers or {})
+        header_names = {name.lower(): name for name in headers}
+        content_type = headers.get(header_names.get('content-type'), '')
+        
+        if (self.gzip_requests and body and len(body) >= self.MIN_GZIP_SIZE
+                and content_type.startswith('application/json')):
+            raw_body = body.encode('utf-8') if isinstance(body, str) else body
+            gzip_body = gzip.compress(raw_body)
+            gzip_headers = {name: value for name, value in headers.items()
+                            if name.lower() != 'content-length'}
+            gzip_headers['content-encoding'] = 'gzip'
+            gzip_headers['content-length'] = str(len(gzip_body))
+            
+            response, content = super().request(uri, method, body=gzip_body, headers=gzip_headers, **kwargs)
+            if response.status not in self.GZIP_REJECTED_STATUSES:
+                return response, content
+            
+            logger.warning("Server rejected gzip request body with %s, sending uncompressed requests",
+                           response.status)
+            self.gzip_requests = False
+        
+        return super().request(uri, method, body=body, headers=headers, **kwargs)
+
+@functools.lru_cache(maxsize=4)
 def get_credentials(credentials_file: str) -> service_account.Credentials:
     """Create and return credentials for Google Sheets access"""
     try:
@@ -31,101 +89,164 @@ def get_credentials(credentials_file: str) -> service_account.Credentials:
             scopes=GOOGLE_SHEETS_SCOPE
         )
     except Exception as e:
-        raise DataProcessingError(f"Failed to create credentials: {str(e)}")
+        raise DataProcessingError(f"Failed to create credentials: {str(e)}") from e
 
-def connect_to_sheets(credentials: service_account.Credentials, spreadsheet_id: str) -> gspread.Spreadsheet:
+@functools.lru_cache(maxsize=4)
+def get_sheets_service(credentials_file: str, gzip_requests: bool = False) -> Any:
+    """Build and cache the Sheets API client for a credentials file"""
     try:
-        gc = gspread.authorize(credentials)
-        return gc.open_by_key(spreadsheet_id)
+        http = AuthorizedHttp(get_credentials(credentials_file),
+                              http=GzipRequestHttp(gzip_requests=gzip_requests))
+        return build('sheets', 'v4', http=http)
     except Exception as e:
-        raise DataProcessingError(f"Failed to connect to Google Sheets: {str(e)}")
+        raise DataProcessingError(f"Failed to build Sheets service: {str(e)}") from e
+
+def columns_to_df(columns: List[List[str]], worksheet_name: str) -> pd.DataFrame:
+    """Build a dataframe from column-major sheet values (header first in each column)"""
+    if not columns:
+        raise DataProcessingError(f"No data found in worksheet {worksheet_name}")
+    
+    # The Sheets API trims trailing empty cells, so pad every column to the same height
+    height = max(len(column) for column in columns)
+    padded = [column + [''] * (height - len(column)) for column in columns]
+    
+    # Key by position so duplicate or blank headers do not overwrite each other
+    df = pd.DataFrame({position: column[1:] for position, column in enumerate(padded)})
+    df.columns = [column[0] for column in padded]
+    return df
 
-def read_worksheet_to_df(spreadsheet: gspread.Spreadsheet, worksheet_name: str) -> pd.DataFrame:
+def read_worksheets_batch(service: Any, 
+                          spreadsheet_id: str, 
+                          worksheet_names: List[str]) -> Dict[str, List[List[str]]]:
+    """Read several worksheets column by column with a single batchGet request"""
     try:
-        worksheet = spreadsheet.worksheet(worksheet_name)
-        all_values = worksheet.get_all_values()
-        if not all_values:
-            raise DataProcessingError(f"No data found in worksheet {worksheet_name}")
-        
-        headers = all_values[0]
-        data = all_values[1:]
-        df = pd.DataFrame(data, columns=headers)
-        
-        if 'date' in df.columns:
-            print(f"\nUnique date values in {worksheet_name}:")
+        result = service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f'{name}!A:ZZ' for name in worksheet_names],
+            majorDimension='COLUMNS'
+        ).execute()
         
-        return df
+        # valueRanges are returned in the same order as the requested ranges
+        return {
+            name: value_range.get('values', [])
+            for name, value_range in zip(worksheet_names, result.get('valueRanges', []))
+        }
     except Exception as e:
-        raise DataProcessingError(f"Failed to read worksheet {worksheet_name}: {str(e)}")
+        raise DataProcessingError(f"Failed to read worksheets {', '.join(worksheet_names)}: {str(e)}") from e
+
+def standardize_column(col: pd.Series) -> pd.Series:
+    """Strip and lowercase a column, converting it to numeric when every non-blank value parses"""
+    if pd.api.types.is_numeric_dtype(col):
+        return col
+    
+    # Empty columns need no string work and are treated as missing numbers
+    if col.eq('').all():
+        return pd.Series(np.nan, index=col.index, name=col.name)
+    
+    # Values read from sheets are already strings, so only cast other dtypes
+    if col.dtype != object:
+        col = col.astype(str)
+    text = col.str.strip().str.lower()
+    
+    numeric = pd.to_numeric(text.str.replace(',', '', regex=False), errors='coerce')
+    if (numeric.notna() | text.isna() | text.isin(['', 'nan'])).all():
+        return numeric
+    return text
 
 def standardize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     try:
-        print("\nStandardizing dataframe...")
-        
-        df_clean = df.copy()
+        logger.debug("Standardizing dataframe...")
         
-        # Standardize column names
-        df_clean.columns = (df_clean.columns.str.lower()
-                          .str.strip()
-                          .str.replace(' ', '_')
-                          .str.replace('-', '_'))
+        # apply builds a new frame, so the caller's dataframe is left untouched
+        df_clean = df.apply(standardize_column)
         
-        # Handle the weight_in_kg to weight rename
-        if 'weight_in_kg' in df_clean.columns:
-            df_clean = df_clean.rename(columns={'weight_in_kg': 'weight'})
-        
-        for column in df_clean.columns:
-            df_clean[column] = df_clean[column].astype(str).str.strip().str.lower()
-            try:
-                numeric_values = pd.to_numeric(df_clean[column].str.replace(',', ''))
-                df_clean[column] = numeric_values
-            except (ValueError, TypeError):
-                pass
+        # Standardize column names and map the known weight aliases to 'weight'
+        columns = (df.columns.str.lower()
+                   .str.strip()
+                   .str.replace(' ', '_')
+                   .str.replace('-', '_'))
+        df_clean.columns = [COLUMN_ALIASES.get(column, column) for column in columns]
         
         return df_clean
     except Exception as e:
-        raise DataProcessingError(f"Failed to standardize dataframe: {str(e)}")
+        raise DataProcessingError(f"Failed to standardize dataframe: {str(e)}") from e
 
 def standardize_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """Parse the date column and add month columns; df is updated in place and returned"""
     if df.empty:
         return df
     
     try:
-        print("\nStandardizing dates...")
-        df = df.copy()
-        
-        date_parsed = False
-        for format in DATE_FORMATS:
-            try:
-                print(f"Trying date format: {format}")
-                df['date'] = pd.to_datetime(df['date'], format=format)
-                date_parsed = True
-                print("Successfully parsed dates using format:", format)
-                break
-            except ValueError as e:
-                print(f"Failed to parse with format {format}: {str(e)}")
-                continue
+        logger.debug("Standardizing dates...")
         
-        if not date_parsed:
-            print("Falling back to mixed format parsing")
-            df['date'] = pd.to_datetime(df['date'], format='mixed', dayfirst=True)
+        raw_dates = df['date']
         
-        if df['date'].isna().any():
-            problematic_dates = df[df['date'].isna()]['date'].unique()
-            print("Warning: Failed to parse these dates:", problematic_dates)
+        # Each format only re-parses the rows the previous formats could not handle
+        parsed_dates = pd.to_datetime(raw_dates, format=DATE_FORMATS[0], errors='coerce')
+        for date_format in DATE_FORMATS[1:]:
+            unparsed = parsed_dates.isna()
+            if not unparsed.any():
+                break
+            logger.debug("Parsing %d remaining dates with format: %s", unparsed.sum(), date_format)
+            parsed_dates[unparsed] = pd.to_datetime(raw_dates[unparsed], format=date_format, errors='coerce')
+        
+        unparsed = parsed_dates.isna()
+        if unparsed.any():
+            logger.debug("Falling back to mixed format parsing for %d dates", unparsed.sum())
+            parsed_dates[unparsed] = pd.to_datetime(raw_dates[unparsed], format='mixed', 
+                                                    dayfirst=True, errors='coerce')
+            unparsed = parsed_dates.isna()
+        
+        if unparsed.any():
+            problematic_dates = raw_dates[unparsed].unique()
+            logger.warning("Failed to parse these dates: %s", problematic_dates)
             raise DataProcessingError(f"Failed to parse dates: {problematic_dates}")
         
+        df['date'] = parsed_dates
+        
         df['month'] = df['date'].dt.strftime('%b').str.lower()
         df['year_month'] = df['date'].dt.strftime('%Y-%b')
         
         return df
     except Exception as e:
-        raise DataProcessingError(f"Failed to standardize dates: {str(e)}")
+        raise DataProcessingError(f"Failed to standardize dates: {str(e)}") from e
+
+
+def aggregate_by_product(df: pd.DataFrame, product_column: str, direction: str) -> pd.DataFrame:
+    """Sum weight (and quantity, where recorded) per month for every product in one pass.
+    
+    Returns one column per product and metric, named total_<product>_<direction>_<metric>,
+    indexed by year_month.
+    """
+    agg_spec = {'weight': ('weight', 'sum')}
+    if 'quantity' in df.columns:
+        agg_spec['quantity'] = ('quantity', 'sum')
+        agg_spec['quantity_count'] = ('quantity', 'count')
+    
+    monthly = df.groupby([product_column, 'year_month'], sort=False).agg(**agg_spec)
+    
+    totals = {}
+    for product_type, product_monthly in monthly.groupby(level=product_column, sort=False):
+        product_monthly = product_monthly.droplevel(product_column)
+        summary_key = product_type.replace(' ', '_').lower()
+        # Only report quantity for products that have quantity data
+        if 'quantity_count' in product_monthly.columns and product_monthly['quantity_count'].sum() > 0:
+            totals[f'total_{summary_key}_{direction}_quantity'] = product_monthly['quantity']
+        totals[f'total_{summary_key}_{direction}_weight'] = product_monthly['weight']
+    
+    return pd.DataFrame(totals)
 
+def running_balance(net_flow: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the opening stock and closing balance for each period of a net flow array"""
+    balance = np.cumsum(net_flow)
+    opening_stock = np.empty_like(balance)
+    opening_stock[:1] = 0.0
+    opening_stock[1:] = balance[:-1]
+    return opening_stock, balance
 
 def create_summary_df(stock_inflow_df: pd.DataFrame, release_df: pd.DataFrame) -> pd.DataFrame:
     try:
-        print("\nCreating summary dataframe...")
+        logger.debug("Creating summary dataframe...")
         
         all_year_months = sorted(list(set(stock_inflow_df['year_month'].unique()) | 
                                     set(release_df['year_month'].unique())))
@@ -137,22 +258,18 @@ def create_summary_df(stock_inflow_df: pd.DataFrame, release_df: pd.DataFrame) -
         # Get unique product types dynamically from the data
         unique_product_types = stock_inflow_df['product_type'].dropna().unique()
         
-        # Calculate weight loss for each product
-        weight_loss_summaries = {}
-        for product_type in unique_product_types:
-            product_data = stock_inflow_df[
-                stock_inflow_df['product_type'] == product_type
-            ].copy()
+        # Calculate weight loss for every product in a single groupby
+        weight_losses = {}
+        if 'kaduna_coldroom_weight' in stock_inflow_df.columns and 'weight' in stock_inflow_df.columns:
+            weight_loss = stock_inflow_df['weight'] - stock_inflow_df['kaduna_coldroom_weight']
+            monthly_weight_loss = weight_loss.groupby(
+                [stock_inflow_df['product_type'], stock_inflow_df['year_month']], sort=False).sum()
             
-            if not product_data.empty and 'kaduna_coldroom_weight' in product_data.columns and 'weight' in product_data.columns:
-                product_data['weight_loss'] = product_data['weight'] - product_data['kaduna_coldroom_weight']
-                weight_loss_summaries[f'{product_type}_weight_loss'] = product_data.groupby('year_month')['weight_loss'].sum()
-        
-        # Create dynamic product summaries for both inflow and release
-        product_summaries = {}
+            for product_type, product_loss in monthly_weight_loss.groupby(level=0, sort=False):
+                weight_losses[f'total_{product_type.replace(" ", "_").lower()}_weight_loss'] = \
+                    product_loss.droplevel(0)
         
         # Get unique product types from both inflow and release data
-        # Standardize casing to match inflow format (title case)
         inflow_products = stock_inflow_df['product_type'].dropna().unique()
         
         if 'product' in release_df.columns:
@@ -161,73 +278,14 @@ def create_summary_df(stock_inflow_df: pd.DataFrame, release_df: pd.DataFrame) -
         else:
             release_products = []
         
-        # Process inflow data for each product type
-        for product_type in inflow_products:
-            product_data = stock_inflow_df[stock_inflow_df['product_type'] == product_type]
-            if not product_data.empty:
-                agg_dict = {'weight': 'sum'}
-                # Add quantity aggregation for products that have quantity data
-                if 'quantity' in product_data.columns and product_data['quantity'].notna().any():
-                    agg_dict['quantity'] = 'sum'
-                
-                product_summaries[f'{product_type}_inflow'] = product_data.groupby('year_month').agg(agg_dict)
-        
-        # Process release data for each product type
-        for product_type in release_products:
-            product_data = release_df[release_df['product'] == product_type]
-            if not product_data.empty:
-                agg_dict = {'weight': 'sum'}
-                # Add quantity aggregation for products that have quantity data
-                if 'quantity' in product_data.columns and product_data['quantity'].notna().any():
-                    agg_dict['quantity'] = 'sum'
-                
-                product_summaries[f'{product_type}_release'] = product_data.groupby('year_month').agg(agg_dict)
-        
-        # Create dynamic summary columns for inflow and release
-        summary_columns = {}
-        
-        # Add inflow columns for each product type
-        for product_type in inflow_products:
-            product_key = f'{product_type}_inflow'
-            if product_key in product_summaries:
-                summary_key = product_type.replace(' ', '_').lower()
-                if 'quantity' in product_summaries[product_key].columns:
-                    summary_columns[f'total_{summary_key}_inflow_quantity'] = (product_key, 'quantity')
-                if 'weight' in product_summaries[product_key].columns:
-                    summary_columns[f'total_{summary_key}_inflow_weight'] = (product_key, 'weight')
-        
-        # Add release columns for each product type
-        for product_type in release_products:
-            product_key = f'{product_type}_release'
-            if product_key in product_summaries:
-                summary_key = product_type.replace(' ', '_').lower()
-                if 'quantity' in product_summaries[product_key].columns:
-                    summary_columns[f'total_{summary_key}_release_quantity'] = (product_key, 'quantity')
-                if 'weight' in product_summaries[product_key].columns:
-                    summary_columns[f'total_{summary_key}_release_weight'] = (product_key, 'weight')
-        
-        # Add weight loss columns
-        for product_type in unique_product_types:
-            weight_loss_key = f'{product_type}_weight_loss'
-            if weight_loss_key in weight_loss_summaries:
-                summary_columns[f'total_{product_type.replace(" ", "_").lower()}_weight_loss'] = weight_loss_key
-        
-        for col_name, summary_key in summary_columns.items():
-            if isinstance(summary_key, tuple):
-                # Handle existing product summaries
-                summary_dict, metric = summary_key
-                if metric in product_summaries[summary_dict].columns:
-                    summary_df[col_name] = summary_df['year_month'].map(
-                        product_summaries[summary_dict][metric]).fillna(0)
-                else:
-                    summary_df[col_name] = 0
-            else:
-                # Handle weight loss summaries
-                if summary_key in weight_loss_summaries:
-                    summary_df[col_name] = summary_df['year_month'].map(
-                        weight_loss_summaries[summary_key]).fillna(0)
-                else:
-                    summary_df[col_name] = 0
+        # Build all monthly totals as one wide frame and join it onto the months in one go
+        monthly_totals = [aggregate_by_product(stock_inflow_df, 'product_type', 'inflow')]
+        if 'product' in release_df.columns:
+            monthly_totals.append(aggregate_by_product(release_df, 'product', 'release'))
+        monthly_totals.append(pd.DataFrame(weight_losses))
+        
+        totals_df = pd.concat(monthly_totals, axis=1).reindex(all_year_months).fillna(0)
+        summary_df = summary_df.join(totals_df, on='year_month')
 
         # Sort by year_month in ascending order to process chronologically
         summary_df['sort_date'] = pd.to_datetime(summary_df['year_month'], format='%Y-%b')
@@ -236,6 +294,7 @@ def create_summary_df(stock_inflow_df: pd.DataFrame, release_df: pd.DataFrame) -
         # Create dynamic opening stock and stock balance columns
         opening_stock_columns = []
         stock_balance_columns = []
+        net_flow_columns = []
         
         # Create opening stock and balance columns for each product type
         all_products = set(inflow_products) | set(release_products)
@@ -243,149 +302,118 @@ def create_summary_df(stock_inflow_df: pd.DataFrame, release_df: pd.DataFrame) -
             summary_key = product_type.replace(' ', '_').lower()
             
             # Add quantity columns if product has quantity data
-            inflow_key = f'{product_type}_inflow'
-            if inflow_key in product_summaries and 'quantity' in product_summaries[inflow_key].columns:
+            if f'total_{summary_key}_inflow_quantity' in summary_df.columns:
                 opening_stock_columns.append(f'{summary_key}_quantity_opening_stock')
                 stock_balance_columns.append(f'{summary_key}_quantity_stock_balance')
+                net_flow_columns.append((f'total_{summary_key}_inflow_quantity',
+                                         f'total_{summary_key}_release_quantity'))
             
             # Add weight columns if product has weight data
-            if (inflow_key in product_summaries and 'weight' in product_summaries[inflow_key].columns) or \
-               (f'{product_type}_release' in product_summaries and 'weight' in product_summaries[f'{product_type}_release'].columns):
+            if f'total_{summary_key}_inflow_weight' in summary_df.columns or \
+               f'total_{summary_key}_release_weight' in summary_df.columns:
                 opening_stock_columns.append(f'{summary_key}_weight_opening_stock')
                 stock_balance_columns.append(f'{summary_key}_weight_stock_balance')
-        
-        # Initialize all opening stock and balance columns
-        for column in opening_stock_columns + stock_balance_columns:
-            summary_df[column] = 0.0
-
-        # Calculate running balances for each month
-        for i in range(len(summary_df)):
-            for product_type in all_products:
-                summary_key = product_type.replace(' ', '_').lower()
-                
-                # Handle quantity columns
-                qty_opening_col = f'{summary_key}_quantity_opening_stock'
-                qty_balance_col = f'{summary_key}_quantity_stock_balance'
-                qty_inflow_col = f'total_{summary_key}_inflow_quantity'
-                qty_release_col = f'total_{summary_key}_release_quantity'
-                
-                if qty_opening_col in summary_df.columns and qty_balance_col in summary_df.columns:
-                    if i == 0:
-                        summary_df.iloc[i, summary_df.columns.get_loc(qty_opening_col)] = 0
-                    else:
-                        summary_df.iloc[i, summary_df.columns.get_loc(qty_opening_col)] = \
-                            summary_df.iloc[i-1, summary_df.columns.get_loc(qty_balance_col)]
-                    
-                    # Calculate balance
-                    opening_stock = summary_df.iloc[i, summary_df.columns.get_loc(qty_opening_col)]
-                    inflow = summary_df.iloc[i, summary_df.columns.get_loc(qty_inflow_col)] if qty_inflow_col in summary_df.columns else 0
-                    release = summary_df.iloc[i, summary_df.columns.get_loc(qty_release_col)] if qty_release_col in summary_df.columns else 0
-                    summary_df.iloc[i, summary_df.columns.get_loc(qty_balance_col)] = opening_stock + inflow - release
-                
-                # Handle weight columns
-                wt_opening_col = f'{summary_key}_weight_opening_stock'
-                wt_balance_col = f'{summary_key}_weight_stock_balance'
-                wt_inflow_col = f'total_{summary_key}_inflow_weight'
-                wt_release_col = f'total_{summary_key}_release_weight'
-                
-                if wt_opening_col in summary_df.columns and wt_balance_col in summary_df.columns:
-                    if i == 0:
-                        summary_df.iloc[i, summary_df.columns.get_loc(wt_opening_col)] = 0
-                    else:
-                        summary_df.iloc[i, summary_df.columns.get_loc(wt_opening_col)] = \
-                            summary_df.iloc[i-1, summary_df.columns.get_loc(wt_balance_col)]
-                    
-                    # Calculate balance
-                    opening_stock = summary_df.iloc[i, summary_df.columns.get_loc(wt_opening_col)]
-                    inflow = summary_df.iloc[i, summary_df.columns.get_loc(wt_inflow_col)] if wt_inflow_col in summary_df.columns else 0
-                    release = summary_df.iloc[i, summary_df.columns.get_loc(wt_release_col)] if wt_release_col in summary_df.columns else 0
-                    summary_df.iloc[i, summary_df.columns.get_loc(wt_balance_col)] = opening_stock + inflow - release
+                net_flow_columns.append((f'total_{summary_key}_inflow_weight',
+                                         f'total_{summary_key}_release_weight'))
+        
+        # Calculate running balances: the stock balance is the cumulative net flow
+        # and each month's opening stock is the previous month's balance
+        opening_stocks = {}
+        stock_balances = {}
+        for opening_col, balance_col, (inflow_col, release_col) in zip(
+                opening_stock_columns, stock_balance_columns, net_flow_columns):
+            net_flow = summary_df.get(inflow_col, 0) - summary_df.get(release_col, 0)
+            opening_stocks[opening_col], stock_balances[balance_col] = running_balance(
+                np.asarray(net_flow, dtype=float))
+        
+        summary_df = summary_df.assign(**opening_stocks, **stock_balances)
 
         # Add percentage change columns for weight loss BEFORE final sorting
         # This ensures we calculate change in chronological order (oldest to newest)
+        pct_change_sources = {}
         for product_type in unique_product_types:
-            weight_loss_col = f'total_{product_type.replace(" ", "_").lower()}_weight_loss'
-            pct_change_col = f'{product_type.replace(" ", "_").lower()}_weight_loss_pct_change'
-            
+            summary_key = product_type.replace(" ", "_").lower()
+            weight_loss_col = f'total_{summary_key}_weight_loss'
             if weight_loss_col in summary_df.columns:
-                # Calculate percentage change (current - previous) / previous * 100
-                summary_df[pct_change_col] = summary_df[weight_loss_col].pct_change() * 100
-                # Replace inf and -inf with 0 (when previous month was 0)
-                summary_df[pct_change_col] = summary_df[pct_change_col].replace([float('inf'), float('-inf')], 0)
-                # Fill NaN values (first month) with 0
-                summary_df[pct_change_col] = summary_df[pct_change_col].fillna(0)
-        
-        # Sort in descending order (newest first) and clean up
-        summary_df = summary_df.sort_values('sort_date', ascending=False)
+                pct_change_sources[f'{summary_key}_weight_loss_pct_change'] = weight_loss_col
+        
+        # Calculate percentage change (current - previous) / previous * 100 for all products at once
+        pct_changes = summary_df[list(pct_change_sources.values())].pct_change() * 100
+        pct_changes.columns = list(pct_change_sources.keys())
+        # Replace inf and -inf with 0 (when previous month was 0) and fill the first month with 0
+        pct_changes = pct_changes.replace([float('inf'), float('-inf')], 0).fillna(0)
+        summary_df = pd.concat([summary_df, pct_changes], axis=1)
+        
+        # Months are unique, so reversing the chronological order puts the newest first
         summary_df['year_month'] = summary_df['sort_date'].dt.strftime('%Y-%m')
-        summary_df = summary_df.drop('sort_date', axis=1)
+        summary_df = summary_df.drop('sort_date', axis=1).iloc[::-1].reset_index(drop=True)
         
         # Format all numeric columns to 3 decimal places
         numeric_columns = summary_df.select_dtypes(include=['float64', 'int64']).columns
-        for col in numeric_columns:
-            summary_df[col] = summary_df[col].astype(float).round(3)
+        summary_df[numeric_columns] = summary_df[numeric_columns].astype(float).round(3)
         
         return summary_df
     except Exception as e:
-        raise DataProcessingError(f"Failed to create summary: {str(e)}")
+        raise DataProcessingError(f"Failed to create summary: {str(e)}") from e
 
 def prepare_df_for_upload(df: pd.DataFrame) -> pd.DataFrame:
-    print("\nPreparing dataframe for upload...")
-    df_copy = df.copy()
+    logger.debug("Preparing dataframe for upload...")
+    date_columns = df.select_dtypes(include=['datetime64']).columns
+    formatted_dates = {col: df[col].dt.strftime('%Y-%m-%d') for col in date_columns}
+    
+    # assign returns a new frame, so the caller's dates are left untouched
+    df_upload = df.assign(**formatted_dates)
     
-    date_columns = df_copy.select_dtypes(include=['datetime64']).columns
-    for col in date_columns:
-        df_copy[col] = df_copy[col].dt.strftime('%Y-%m-%d')
+    # Blank out missing values with one mask over the whole frame, then cast once
+    df_upload = (df_upload.astype(object)
+                 .where(df_upload.notna(), '')
+                 .astype(str)
+                 .replace('nan', '', regex=False))
     
-    for col in df_copy.columns:
-        df_copy[col] = df_copy[col].fillna('')
-        df_copy[col] = df_copy[col].astype(str)
-        df_copy[col] = df_copy[col].replace('nan', '')
+    return df_upload
+
+def df_to_values(df: pd.DataFrame) -> List[List[str]]:
+    df_to_upload = prepare_df_for_upload(df)
     
-    return df_copy
+    # prepare_df_for_upload guarantees string cells with no NaN
+    return [df_to_upload.columns.tolist(), *df_to_upload.values.tolist()]
 
-def upload_df_to_gsheet(df: pd.DataFrame, 
-                       spreadsheet_id: str, 
-                       sheet_name: str, 
-                       service: Any) -> bool:
+def upload_all(upload_tasks: List[Tuple[pd.DataFrame, str]], 
+               spreadsheet_id: str, 
+               service: Any) -> bool:
+    """Clear and rewrite several sheets with one batchClear and one batchUpdate request"""
+    sheet_names = [sheet_name for _, sheet_name in upload_tasks]
     try:
-        print(f"\nUploading data to sheet: {sheet_name}")
-        df_to_upload = prepare_df_for_upload(df)
-        
-        values = [df_to_upload.columns.tolist()]
-        values.extend([[str(cell) if cell is not None and cell == cell else '' 
-                       for cell in row] for row in df_to_upload.values.tolist()])
+        logger.info("Uploading data to sheets: %s", ', '.join(sheet_names))
+        data = [
+            {'range': f'{sheet_name}!A1', 'values': df_to_values(df)}
+            for df, sheet_name in upload_tasks
+        ]
         
-        service.spreadsheets().values().clear(
+        service.spreadsheets().values().batchClear(
             spreadsheetId=spreadsheet_id,
-            range=f'{sheet_name}!A1:ZZ'
+            body={'ranges': [f'{sheet_name}!A1:ZZ' for sheet_name in sheet_names]}
         ).execute()
         
-        result = service.spreadsheets().values().update(
+        result = service.spreadsheets().values().batchUpdate(
             spreadsheetId=spreadsheet_id,
-            range=f'{sheet_name}!A1',
-            valueInputOption='RAW',
-            body={'values': values}
+            body={'valueInputOption': 'RAW', 'data': data}
         ).execute()
         
-        print(f"Updated {result.get('updatedCells')} cells in {sheet_name}")
+        for response in result.get('responses', []):
+            logger.info("Updated %s cells in %s", response.get('updatedCells'), response.get('updatedRange'))
         return True
         
     except Exception as e:
-        print(f"Failed to upload to {sheet_name}: {str(e)}")
+        logger.error("Failed to upload to %s: %s", ', '.join(sheet_names), e)
         return False
 
 def process_sheets_data(stock_inflow_df: pd.DataFrame, 
                        release_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     try:
-        print("\nProcessing sheets data...")
+        logger.info("Processing sheets data...")
         
         stock_inflow_df = standardize_dataframe(stock_inflow_df)
-        
-        # Handle the weight_at_delivery to weight rename for stock_inflow only
-        if 'weight_at_delivery' in stock_inflow_df.columns:
-            stock_inflow_df = stock_inflow_df.rename(columns={'weight_at_delivery': 'weight'})
-        
         release_df = standardize_dataframe(release_df)
         
         # Filter out rows where both date and product_type are empty for stock_inflow
@@ -420,13 +448,23 @@ def process_sheets_data(stock_inflow_df: pd.DataFrame,
         return stock_inflow_df, release_df, summary_df
     
     except Exception as e:
-        raise DataProcessingError(f"Failed to process sheets data: {str(e)}")
+        raise DataProcessingError(f"Failed to process sheets data: {str(e)}") from e
 
 def main():
     CREDENTIALS_FILE = 'credentials.json'
     
+    # INFO by default; set LOG_LEVEL=DEBUG to trace each processing step
+    log_level_name = (os.getenv('LOG_LEVEL') or 'INFO').upper()
+    log_level = logging.getLevelName(log_level_name)
+    logging.basicConfig(
+        level=log_level if isinstance(log_level, int) else logging.INFO,
+        format='%(asctime)s %(levelname)s %(message)s'
+    )
+    if not isinstance(log_level, int):
+        logger.warning("Unknown LOG_LEVEL %r, using INFO", log_level_name)
+    
     try:
-        print("\nStarting data processing...")
+        logger.info("Starting data processing...")
         
         source_spreadsheet_id = os.getenv('SOURCE_SPREADSHEET_ID')
         output_spreadsheet_id = os.getenv('OUTPUT_SPREADSHEET_ID')
@@ -436,14 +474,19 @@ def main():
         if not output_spreadsheet_id:
             raise DataProcessingError("OUTPUT_SPREADSHEET_ID environment variable not set")
             
-        # Create credentials and services once
-        credentials = get_credentials(CREDENTIALS_FILE)
-        source_spreadsheet = connect_to_sheets(credentials, source_spreadsheet_id)
-        sheets_service = build('sheets', 'v4', credentials=credentials)
-        
-        # Read the worksheets from source
-        stock_inflow_df = read_worksheet_to_df(source_spreadsheet, SHEET_NAMES['STOCK_INFLOW'])
-        release_df = read_worksheet_to_df(source_spreadsheet, SHEET_NAMES['RELEASE'])
+        # Credentials and services are cached per credentials file;
+        # set GZIP_REQUESTS=true to opt in to compressed request bodies
+        gzip_requests = os.getenv('GZIP_REQUESTS', '').lower() in ('1', 'true', 'yes')
+        sheets_service = get_sheets_service(CREDENTIALS_FILE, gzip_requests)
+        
+        # Read the worksheets from source in a single request
+        source_values = read_worksheets_batch(
+            sheets_service, source_spreadsheet_id,
+            [SHEET_NAMES['STOCK_INFLOW'], SHEET_NAMES['RELEASE']])
+        stock_inflow_df = columns_to_df(source_values.get(SHEET_NAMES['STOCK_INFLOW'], []), 
+                                       SHEET_NAMES['STOCK_INFLOW'])
+        release_df = columns_to_df(source_values.get(SHEET_NAMES['RELEASE'], []), 
+                                  SHEET_NAMES['RELEASE'])
         
         # Process the data
         stock_inflow_df, release_df, summary_df = process_sheets_data(
@@ -456,20 +499,16 @@ def main():
             (summary_df, SHEET_NAMES['SUMMARY'])
         ]
         
-        # Upload all datasets
-        success = True
-        for df, sheet_name in upload_tasks:
-            if not upload_df_to_gsheet(df, output_spreadsheet_id, sheet_name, sheets_service):
-                success = False
-                print(f"Failed to upload {sheet_name}")
+        # Upload all datasets in a single batch
+        success = upload_all(upload_tasks, output_spreadsheet_id, sheets_service)
         
         if success:
-            print("\nData processing and upload completed successfully!")
+            logger.info("Data processing and upload completed successfully!")
         else:
             raise DataProcessingError("Failed to upload one or more datasets")
             
     except Exception as e:
-        print(f"\nAn error occurred: {str(e)}")
+        logger.error("An error occurred: %s", e)
         raise
 
 if __name__ == "__main__":